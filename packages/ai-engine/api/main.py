@@ -293,14 +293,16 @@ async def get_ratings(top_n: int = Query(default=20, le=100)):
     
     # Get Poisson strengths if available
     poisson_model = models.get("poisson")
+    attack_strengths = poisson_model.attack_strengths if poisson_model else {}
+    defense_strengths = poisson_model.defense_strengths if poisson_model else {}
     
     results = []
     for team, elo in rankings:
         rating = TeamRatingResponse(
             team=team,
             elo=elo,
-            attack_strength=poisson_model.attack_strengths.get(team) if poisson_model else None,
-            defense_strength=poisson_model.defense_strengths.get(team) if poisson_model else None
+            attack_strength=attack_strengths.get(team),
+            defense_strength=defense_strengths.get(team)
         )
         results.append(rating)
     
@@ -7,6 +7,7 @@ from .base import (
     PredictionResult,
     MatchResult,
     normalize_probabilities,
+    normalize_three_way,
     calculate_log_loss,
     calculate_brier_score,
     calculate_rps
@@ -21,6 +22,7 @@ __all__ = [
     "PredictionResult",
     "MatchResult",
     "normalize_probabilities",
+    "normalize_three_way",
     "calculate_log_loss",
     "calculate_brier_score",
     "calculate_rps",
@@ -203,6 +203,18 @@ def normalize_probabilities(probs: List[float]) -> List[float]:
     return [p / total for p in probs]
 
 
+def normalize_three_way(
+    home: float,
+    draw: float,
+    away: float
+) -> Tuple[float, float, float]:
+    """Normalize H/D/A probabilities to sum to 1 (unrolled 3-outcome case)"""
+    total = home + draw + away
+    if total > 0:
+        return home / total, draw / total, away / total
+    return 1 / 3, 1 / 3, 1 / 3
+
+
 def calculate_log_loss(y_true: np.ndarray, y_pred: np.ndarray, eps: float = 1e-15) -> float:
     """Calculate log loss (cross-entropy)"""
     y_pred = np.clip(y_pred, eps, 1 - eps)
@@ -2,16 +2,108 @@
 Elo Rating System - Dinamik takım güç sıralaması
 """
 
+import math
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from numba import njit
 import structlog
 
-from .base import BasePredictor, PredictionResult, normalize_probabilities
+from .base import BasePredictor, PredictionResult, normalize_three_way
 
 logger = structlog.get_logger()
 
+# 10 ** (x / 400) == exp(_ELO_ALPHA * x)
+_ELO_ALPHA = math.log(10) / 400
+
+
+@njit(cache=True, fastmath=True)
+def _elo_expected(rating_a: float, rating_b: float) -> float:
+    """Elo expected score of A against B"""
+    return 1.0 / (1.0 + math.exp(_ELO_ALPHA * (rating_b - rating_a)))
+
+
+@njit(cache=True, fastmath=True)
+def _elo_k_factor(
+    goal_diff: int,
+    matches: int,
+    k_base: float,
+    k_min: float,
+    k_max: float,
+    goal_diff_multiplier: float
+) -> float:
+    """Dynamic K-factor from goal difference and matches played"""
+    k = k_base
+    if goal_diff > 1:
+        k *= 1.0 + goal_diff_multiplier * math.log(goal_diff)
+    
+    if matches < 10:
+        k *= 1.5
+    elif matches < 20:
+        k *= 1.2
+    
+    return min(max(k, k_min), k_max)
+
+
+@njit(cache=True, fastmath=True)
+def _elo_sweep(
+    home_idx: np.ndarray,
+    away_idx: np.ndarray,
+    home_goals: np.ndarray,
+    away_goals: np.ndarray,
+    ratings: np.ndarray,
+    matches_played: np.ndarray,
+    home_after: np.ndarray,
+    away_after: np.ndarray,
+    k_base: float,
+    k_min: float,
+    k_max: float,
+    home_advantage: float,
+    goal_diff_multiplier: float
+):
+    """
+    Sequential Elo update over integer-coded matches.
+    
+    Mirrors EloModel._process_match; ratings and matches_played are
+    updated in place and post-match ratings are written to
+    home_after/away_after.
+    """
+    for i in range(home_idx.shape[0]):
+        h = home_idx[i]
+        a = away_idx[i]
+        
+        # Expected scores
+        home_expected = _elo_expected(ratings[h] + home_advantage, ratings[a])
+        away_expected = 1.0 - home_expected
+        
+        # Actual result
+        if home_goals[i] > away_goals[i]:
+            home_actual = 1.0
+        elif home_goals[i] == away_goals[i]:
+            home_actual = 0.5
+        else:
+            home_actual = 0.0
+        away_actual = 1.0 - home_actual
+        
+        # K-factor
+        goal_diff = abs(home_goals[i] - away_goals[i])
+        k_home = _elo_k_factor(
+            goal_diff, matches_played[h], k_base, k_min, k_max, goal_diff_multiplier
+        )
+        k_away = _elo_k_factor(
+            goal_diff, matches_played[a], k_base, k_min, k_max, goal_diff_multiplier
+        )
+        
+        # Update ratings
+        ratings[h] += k_home * (home_actual - home_expected)
+        ratings[a] += k_away * (away_actual - away_expected)
+        home_after[i] = ratings[h]
+        away_after[i] = ratings[a]
+        
+        matches_played[h] += 1
+        matches_played[a] += 1
+
 
 class EloModel(BasePredictor):
     """
@@ -39,15 +131,93 @@ class EloModel(BasePredictor):
     # Goal difference multiplier
     GOAL_DIFF_MULTIPLIER = 0.5
     
+    # log(goal_diff) lookup, index 0 -> log(1)
+    _LOG_TABLE = tuple(math.log(d) for d in range(1, 32))
+    
     # Season regression factor
     SEASON_REGRESSION = 0.33
     
-    def __init__(self, version: str = "1.0"):
+    # Maximum number of cached (home, away) predictions
+    PREDICTION_CACHE_SIZE = 4096
+    
+    def __init__(self, version: str = "1.0", track_history: bool = False):
         super().__init__(model_name="elo", version=version)
         
-        self.ratings = {}  # team -> current rating
+        # Record per-team rating history (costly on long match histories)
+        self.track_history = track_history
+        
+        # Per-team state stored as parallel arrays indexed by team id;
+        # buffers grow geometrically, only the first len(_teams) entries are live
+        self._teams: List[str] = []  # team id -> team
+        self._team_index: Dict[str, int] = {}  # team -> team id
+        self._ratings_buf = np.empty(0, dtype=np.float64)  # team id -> current rating
+        self._matches_buf = np.empty(0, dtype=np.int32)  # team id -> count
         self.rating_history = {}  # team -> list of (date, rating)
-        self.matches_played = {}  # team -> count
+        
+        # (home, away) -> (probs, home_rating, away_rating); cleared on rating changes
+        self._prediction_cache: Dict[Tuple[str, str], Tuple[Tuple[float, float, float], float, float]] = {}
+    
+    @property
+    def _ratings_arr(self) -> np.ndarray:
+        """View of the live ratings, indexed by team id"""
+        return self._ratings_buf[:len(self._teams)]
+    
+    @_ratings_arr.setter
+    def _ratings_arr(self, values: np.ndarray):
+        self._ratings_buf = values
+    
+    @property
+    def _matches_arr(self) -> np.ndarray:
+        """View of the live match counts, indexed by team id"""
+        return self._matches_buf[:len(self._teams)]
+    
+    @_matches_arr.setter
+    def _matches_arr(self, values: np.ndarray):
+        self._matches_buf = values
+    
+    @property
+    def ratings(self) -> Dict[str, float]:
+        """Current ratings as a team -> rating dict"""
+        return dict(zip(self._teams, self._ratings_arr.tolist()))
+    
+    @property
+    def matches_played(self) -> Dict[str, int]:
+        """Matches processed per team as a team -> count dict"""
+        return dict(zip(self._teams, self._matches_arr.tolist()))
+    
+    def _ensure_team(self, team: str) -> int:
+        """Get team id, registering the team with the initial rating if new"""
+        idx = self._team_index.get(team)
+        if idx is None:
+            idx = len(self._teams)
+            if idx == len(self._ratings_buf):
+                self._ratings_buf = self._grow(self._ratings_buf, idx)
+            if idx == len(self._matches_buf):
+                self._matches_buf = self._grow(self._matches_buf, idx)
+            
+            self._ratings_buf[idx] = self.INITIAL_RATING
+            self._matches_buf[idx] = 0
+            self._teams.append(team)
+            self._team_index[team] = idx
+            if self.track_history:
+                self.rating_history[team] = []
+        return idx
+    
+    @staticmethod
+    def _grow(buf: np.ndarray, size: int) -> np.ndarray:
+        """Copy of the first size entries of buf with doubled capacity"""
+        grown = np.empty(max(2 * size, 16), dtype=buf.dtype)
+        grown[:size] = buf[:size]
+        return grown
+    
+    def _ratings_for(self, teams) -> np.ndarray:
+        """Vector of current ratings (average for unknown teams)"""
+        idx = np.fromiter(
+            (self._team_index.get(t, -1) for t in teams),
+            dtype=np.intp, count=len(teams)
+        )
+        # Index -1 picks the trailing average rating
+        return np.append(self._ratings_arr, float(self.AVERAGE_RATING))[idx]
     
     def train(self, data: pd.DataFrame) -> Dict[str, float]:
         """
@@ -62,23 +232,51 @@ class EloModel(BasePredictor):
         logger.info("training_started", model=self.model_name, samples=len(data))
         
         # Sort by date
-        matches = data[data["home_score"].notna()].copy()
-        matches = matches.sort_values("match_date")
-        
-        # Reset ratings
-        self.ratings = {}
-        self.rating_history = {}
-        self.matches_played = {}
-        
-        # Process each match
-        for _, row in matches.iterrows():
-            self._process_match(
-                home_team=row["home_team"],
-                away_team=row["away_team"],
-                home_score=int(row["home_score"]),
-                away_score=int(row["away_score"]),
-                match_date=row.get("match_date")
-            )
+        matches = data.loc[data["home_score"].notna()].sort_values("match_date")
+        
+        # Factorize teams in order of first appearance; a missing team name
+        # gets its own entry rather than the -1 sentinel, which the
+        # unchecked kernel would treat as the last team
+        codes, teams = pd.factorize(
+            np.column_stack([matches["home_team"], matches["away_team"]]).ravel(),
+            use_na_sentinel=False
+        )
+        assert len(codes) == 0 or codes.min() >= 0
+        codes = codes.reshape(-1, 2)
+        home_idx = np.ascontiguousarray(codes[:, 0])
+        away_idx = np.ascontiguousarray(codes[:, 1])
+        home_goals = matches["home_score"].to_numpy(dtype=np.int64)
+        away_goals = matches["away_score"].to_numpy(dtype=np.int64)
+        
+        ratings = np.full(len(teams), float(self.INITIAL_RATING))
+        matches_played = np.zeros(len(teams), dtype=np.int32)
+        home_after = np.empty(len(matches))
+        away_after = np.empty(len(matches))
+        
+        # Process all matches in one compiled pass
+        _elo_sweep(
+            home_idx, away_idx, home_goals, away_goals,
+            ratings, matches_played, home_after, away_after,
+            float(self.K_BASE), float(self.K_MIN), float(self.K_MAX),
+            float(self.HOME_ADVANTAGE), float(self.GOAL_DIFF_MULTIPLIER)
+        )
+        
+        self._teams = list(teams)
+        self._team_index = {team: i for i, team in enumerate(self._teams)}
+        self._ratings_arr = ratings
+        self._matches_arr = matches_played
+        self.rating_history = {team: [] for team in teams} if self.track_history else {}
+        self._prediction_cache.clear()
+        
+        # Update history
+        if self.track_history and "match_date" in matches.columns:
+            for h, a, date, home_rating, away_rating in zip(
+                home_idx, away_idx, matches["match_date"].tolist(),
+                home_after.tolist(), away_after.tolist()
+            ):
+                if date:
+                    self.rating_history[teams[h]].append((date, home_rating))
+                    self.rating_history[teams[a]].append((date, away_rating))
         
         # Calculate metrics
         metrics = self._evaluate(matches)
@@ -89,7 +287,7 @@ class EloModel(BasePredictor):
         logger.info(
             "training_completed",
             model=self.model_name,
-            teams=len(self.ratings),
+            teams=len(self._teams),
             **metrics
         )
         
@@ -106,19 +304,12 @@ class EloModel(BasePredictor):
         """Process a single match and update ratings"""
         
         # Initialize teams if needed
-        if home_team not in self.ratings:
-            self.ratings[home_team] = self.INITIAL_RATING
-            self.rating_history[home_team] = []
-            self.matches_played[home_team] = 0
-        
-        if away_team not in self.ratings:
-            self.ratings[away_team] = self.INITIAL_RATING
-            self.rating_history[away_team] = []
-            self.matches_played[away_team] = 0
+        h = self._ensure_team(home_team)
+        a = self._ensure_team(away_team)
         
         # Get current ratings
-        home_rating = self.ratings[home_team]
-        away_rating = self.ratings[away_team]
+        home_rating = float(self._ratings_arr[h])
+        away_rating = float(self._ratings_arr[a])
         
         # Expected scores
         home_expected = self._expected_score(home_rating + self.HOME_ADVANTAGE, away_rating)
@@ -141,21 +332,22 @@ class EloModel(BasePredictor):
         home_delta = k_home * (home_actual - home_expected)
         away_delta = k_away * (away_actual - away_expected)
         
-        self.ratings[home_team] += home_delta
-        self.ratings[away_team] += away_delta
+        self._ratings_arr[h] += home_delta
+        self._ratings_arr[a] += away_delta
+        self._prediction_cache.clear()
         
         # Update history
-        if match_date:
-            self.rating_history[home_team].append((match_date, self.ratings[home_team]))
-            self.rating_history[away_team].append((match_date, self.ratings[away_team]))
+        if self.track_history and match_date:
+            self.rating_history[home_team].append((match_date, float(self._ratings_arr[h])))
+            self.rating_history[away_team].append((match_date, float(self._ratings_arr[a])))
         
         # Increment match count
-        self.matches_played[home_team] += 1
-        self.matches_played[away_team] += 1
+        self._matches_arr[h] += 1
+        self._matches_arr[a] += 1
     
     def _expected_score(self, rating_a: float, rating_b: float) -> float:
         """Calculate expected score using Elo formula"""
-        return 1 / (1 + 10 ** ((rating_b - rating_a) / 400))
+        return 1.0 / (1.0 + math.exp(_ELO_ALPHA * (rating_b - rating_a)))
     
     def _calculate_k_factor(
         self, 
@@ -171,45 +363,72 @@ class EloModel(BasePredictor):
         # Adjust for goal difference
         goal_diff = abs(goals_for - goals_against)
         if goal_diff > 1:
-            k *= (1 + self.GOAL_DIFF_MULTIPLIER * np.log(goal_diff))
+            if goal_diff <= len(self._LOG_TABLE):
+                log_diff = self._LOG_TABLE[goal_diff - 1]
+            else:
+                log_diff = math.log(goal_diff)
+            k *= (1 + self.GOAL_DIFF_MULTIPLIER * log_diff)
         
         # Adjust for matches played (higher K for new teams)
-        matches = self.matches_played.get(team, 0)
+        idx = self._team_index.get(team)
+        matches = self._matches_arr[idx] if idx is not None else 0
         if matches < 10:
             k *= 1.5
         elif matches < 20:
             k *= 1.2
         
-        return np.clip(k, self.K_MIN, self.K_MAX)
+        return max(self.K_MIN, min(self.K_MAX, k))
     
     def _evaluate(self, data: pd.DataFrame) -> Dict[str, float]:
         """Evaluate model predictions"""
-        correct = 0
-        total = 0
-        
-        for _, row in data.iterrows():
-            pred = self.predict({
-                "home_team": row["home_team"],
-                "away_team": row["away_team"]
-            })
-            
-            # Actual result
-            if row["home_score"] > row["away_score"]:
-                actual = "H"
-            elif row["home_score"] == row["away_score"]:
-                actual = "D"
-            else:
-                actual = "A"
-            
-            if pred.get("predicted_result") == actual:
-                correct += 1
-            total += 1
+        total = len(data)
+        if total == 0:
+            return {"accuracy": 0, "samples": 0}
+        
+        # Look up ratings for all matches at once
+        home_ratings = self._ratings_for(data["home_team"])
+        away_ratings = self._ratings_for(data["away_team"])
+        
+        probs = self._outcome_probs(home_ratings, away_ratings)
+        predicted = np.argmax(probs, axis=1)
+        
+        # Actual result (0 = H, 1 = D, 2 = A)
+        home_score = data["home_score"].to_numpy()
+        away_score = data["away_score"].to_numpy()
+        actual = np.select(
+            [home_score > away_score, home_score == away_score],
+            [0, 1],
+            default=2
+        )
+        
+        correct = int(np.sum(predicted == actual))
         
         return {
-            "accuracy": round(correct / total, 4) if total > 0 else 0,
+            "accuracy": round(correct / total, 4),
             "samples": total
         }
     
+    def _outcome_probs(
+        self,
+        home_ratings: np.ndarray,
+        away_ratings: np.ndarray
+    ) -> np.ndarray:
+        """
+        H/D/A probabilities for arrays of ratings.
+        
+        Same probability model as predict(), one row per match.
+        """
+        diff = (home_ratings + self.HOME_ADVANTAGE) - away_ratings
+        home_win = 1 / (1 + np.exp(-_ELO_ALPHA * diff))
+        draw = 0.26 * np.exp(-np.abs(diff) / 400)
+        probs = np.column_stack([
+            home_win * (1 - draw),
+            draw,
+            (1 - home_win) * (1 - draw)
+        ])
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs
+    
     def predict(self, match_data: Dict) -> Dict[str, Any]:
         """
         Predict match outcome using Elo ratings.
@@ -223,9 +442,28 @@ class EloModel(BasePredictor):
         home_team = match_data.get("home_team")
         away_team = match_data.get("away_team")
         
+        # Probabilities only depend on the two teams' current ratings
+        key = (home_team, away_team)
+        cached = self._prediction_cache.get(key)
+        if cached is None:
+            cached = self._match_probs(home_team, away_team)
+            if len(self._prediction_cache) >= self.PREDICTION_CACHE_SIZE:
+                # Evict the oldest entry
+                self._prediction_cache.pop(next(iter(self._prediction_cache)), None)
+            self._prediction_cache[key] = cached
+        
+        probs, home_rating, away_rating = cached
+        return self._build_output(match_data, probs, home_rating, away_rating)
+    
+    def _match_probs(
+        self,
+        home_team: str,
+        away_team: str
+    ) -> Tuple[Tuple[float, float, float], float, float]:
+        """H/D/A probabilities plus the ratings they were computed from"""
         # Get ratings (use average for unknown teams)
-        home_rating = self.ratings.get(home_team, self.AVERAGE_RATING)
-        away_rating = self.ratings.get(away_team, self.AVERAGE_RATING)
+        home_rating = self.get_rating(home_team)
+        away_rating = self.get_rating(away_team)
         
         # Adjust for home advantage
         home_adj = home_rating + self.HOME_ADVANTAGE
@@ -245,7 +483,47 @@ class EloModel(BasePredictor):
         away_win_prob = away_win_prob * (1 - draw_prob)
         
         # Normalize
-        probs = normalize_probabilities([home_win_prob, draw_prob, away_win_prob])
+        probs = normalize_three_way(home_win_prob, draw_prob, away_win_prob)
+        
+        return probs, home_rating, away_rating
+    
+    def predict_batch(self, matches: List[Dict]) -> List[Dict]:
+        """
+        Predict multiple matches at once.
+        
+        Ratings are looked up and probabilities computed as arrays;
+        output dicts are the same as predict() returns.
+        
+        Args:
+            matches: List of dicts with home_team, away_team
+            
+        Returns:
+            List of prediction dictionaries
+        """
+        if not matches:
+            return []
+        
+        home_ratings = self._ratings_for([m.get("home_team") for m in matches])
+        away_ratings = self._ratings_for([m.get("away_team") for m in matches])
+        probs = self._outcome_probs(home_ratings, away_ratings)
+        
+        return [
+            self._build_output(match, match_probs, home_rating, away_rating)
+            for match, match_probs, home_rating, away_rating in zip(
+                matches, probs.tolist(), home_ratings.tolist(), away_ratings.tolist()
+            )
+        ]
+    
+    def _build_output(
+        self,
+        match_data: Dict,
+        probs: Sequence[float],
+        home_rating: float,
+        away_rating: float
+    ) -> Dict[str, Any]:
+        """Wrap H/D/A probabilities into the prediction dictionary"""
+        home_team = match_data.get("home_team")
+        away_team = match_data.get("away_team")
         
         result = PredictionResult(
             home_win_prob=probs[0],
@@ -269,26 +547,27 @@ class EloModel(BasePredictor):
     
     def get_rating(self, team: str) -> float:
         """Get current Elo rating for a team"""
-        return self.ratings.get(team, self.AVERAGE_RATING)
+        idx = self._team_index.get(team)
+        if idx is None:
+            return self.AVERAGE_RATING
+        return float(self._ratings_arr[idx])
     
     def get_rankings(self, top_n: Optional[int] = None) -> List[Tuple[str, float]]:
         """Get team rankings by Elo rating"""
-        sorted_teams = sorted(
-            self.ratings.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
+        order = np.argsort(-self._ratings_arr, kind="stable")
         
         if top_n:
-            sorted_teams = sorted_teams[:top_n]
+            order = order[:top_n]
         
-        return [(team, round(rating, 1)) for team, rating in sorted_teams]
+        return [(self._teams[i], round(float(self._ratings_arr[i]), 1)) for i in order]
     
     def apply_season_regression(self):
         """Apply season regression - ratings move toward average"""
-        for team in self.ratings:
-            diff = self.ratings[team] - self.AVERAGE_RATING
-            self.ratings[team] -= diff * self.SEASON_REGRESSION
+        # r - (r - avg) * f == r * (1 - f) + avg * f, done in place
+        ratings = self._ratings_arr
+        ratings *= 1 - self.SEASON_REGRESSION
+        ratings += self.AVERAGE_RATING * self.SEASON_REGRESSION
+        self._prediction_cache.clear()
         
         logger.info("season_regression_applied", factor=self.SEASON_REGRESSION)
     
@@ -299,8 +578,8 @@ class EloModel(BasePredictor):
         neutral: bool = False
     ) -> Dict[str, float]:
         """Calculate head-to-head win probability"""
-        rating_a = self.ratings.get(team_a, self.AVERAGE_RATING)
-        rating_b = self.ratings.get(team_b, self.AVERAGE_RATING)
+        rating_a = self.get_rating(team_a)
+        rating_b = self.get_rating(team_b)
         
         if not neutral:
             rating_a += self.HOME_ADVANTAGE
@@ -311,3 +590,21 @@ class EloModel(BasePredictor):
             team_a: round(prob_a, 4),
             team_b: round(1 - prob_a, 4)
         }
+    
+    def head_to_head_matrix(
+        self,
+        teams: List[str],
+        neutral: bool = False
+    ) -> np.ndarray:
+        """
+        Head-to-head win probabilities for every pairing of teams.
+        
+        Returns:
+            2D array where [i,j] = P(teams[i] beats teams[j]), with teams[i]
+            at home unless neutral
+        """
+        ratings = self._ratings_for(teams)
+        home_ratings = ratings if neutral else ratings + self.HOME_ADVANTAGE
+        
+        diff = home_ratings[:, None] - ratings[None, :]
+        return 1 / (1 + np.exp(-_ELO_ALPHA * diff))
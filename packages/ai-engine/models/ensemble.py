@@ -6,7 +6,7 @@ import numpy as np
 from typing import Any, Dict, List, Optional, Tuple
 import structlog
 
-from .base import BasePredictor, PredictionResult, normalize_probabilities
+from .base import BasePredictor, PredictionResult, normalize_three_way
 from .poisson import PoissonModel
 from .elo import EloModel
 from .xgboost_model import XGBoostModel
@@ -146,6 +146,126 @@ class EnsembleModel(BasePredictor):
         # Calculate confidence based on model agreement
         confidence = self._calculate_ensemble_confidence(predictions)
         
+        return self._build_output(match_data, combined, confidence, model_predictions)
+    
+    def predict_batch(self, matches: List[Dict]) -> List[Dict]:
+        """
+        Make ensemble predictions for multiple matches.
+        
+        Each model predicts the whole batch, then predictions are combined
+        on a (models, matches, 3) probability tensor. Output dicts are the
+        same as predict() returns.
+        
+        Args:
+            matches: List of match data
+            
+        Returns:
+            List of combined predictions
+        """
+        if not self.models:
+            return [self._default_prediction(match) for match in matches]
+        if not matches:
+            return []
+        
+        n_models = len(self.models)
+        n_matches = len(matches)
+        
+        probs = np.zeros((n_models, n_matches, 3))
+        goals = np.zeros((n_models, n_matches, 2))
+        valid = np.zeros((n_models, n_matches), dtype=bool)
+        has_goals = np.zeros((n_models, n_matches), dtype=bool)
+        model_predictions = [{} for _ in matches]
+        
+        # Get predictions from each model
+        for m, model in enumerate(self.models):
+            try:
+                preds = model.predict_batch(matches)
+            except Exception as e:
+                logger.warning("model_predict_error", model=model.model_name, error=str(e))
+                continue
+            
+            for n, pred in enumerate(preds):
+                if pred.get("error"):
+                    continue
+                valid[m, n] = True
+                probs[m, n] = (pred["home_win_prob"], pred["draw_prob"], pred["away_win_prob"])
+                if pred.get("expected_home_goals"):
+                    has_goals[m, n] = True
+                    goals[m, n] = (pred["expected_home_goals"], pred["expected_away_goals"])
+                model_predictions[n][model.model_name] = pred
+        
+        n_valid = valid.sum(axis=0)
+        
+        # Per-(model, match) weights, zero where the model gave no prediction
+        if self.strategy == "weighted":
+            fallback = 1 / np.maximum(n_valid, 1)
+            weights = np.array([
+                self.weights.get(model.model_name, np.nan) for model in self.models
+            ])[:, None]
+            weights = np.where(np.isnan(weights), fallback[None, :], weights)
+            weights = np.where(valid, weights, 0.0)
+        else:
+            weights = valid.astype(float)
+        
+        # Combine probabilities
+        combined = np.einsum("mn,mnk->nk", weights, probs)
+        totals = combined.sum(axis=1, keepdims=True)
+        combined = np.divide(
+            combined, totals,
+            out=np.full_like(combined, 1 / 3),
+            where=totals > 0
+        )
+        
+        # Combine expected goals where available
+        goals_weights = np.where(has_goals, weights, 0.0)
+        goals_totals = goals_weights.sum(axis=0)
+        combined_goals = np.einsum("mn,mnk->nk", goals_weights, goals)
+        combined_goals = np.divide(
+            combined_goals, goals_totals[:, None],
+            out=np.zeros_like(combined_goals),
+            where=goals_totals[:, None] > 0
+        )
+        any_goals = has_goals.any(axis=0)
+        
+        # Confidence from model agreement and probability spread
+        outcome = np.argmax(probs, axis=2)
+        votes = np.stack([(valid & (outcome == k)).sum(axis=0) for k in range(3)], axis=1)
+        n_safe = np.maximum(n_valid, 1)
+        agreement = votes.max(axis=1) / n_safe
+        avg_max_prob = np.where(valid, probs.max(axis=2), 0.0).sum(axis=0) / n_safe
+        confidence = np.where(n_valid < 2, 0.5, (agreement + avg_max_prob) / 2)
+        
+        outputs = []
+        for n, match in enumerate(matches):
+            if not n_valid[n]:
+                outputs.append(self._default_prediction(match))
+                continue
+            
+            exp_home, exp_away = combined_goals[n].tolist() if any_goals[n] else (None, None)
+            home_win, draw, away_win = combined[n].tolist()
+            outputs.append(self._build_output(
+                match,
+                {
+                    "home_win_prob": home_win,
+                    "draw_prob": draw,
+                    "away_win_prob": away_win,
+                    "expected_home_goals": exp_home,
+                    "expected_away_goals": exp_away
+                },
+                float(confidence[n]),
+                model_predictions[n]
+            ))
+        
+        return outputs
+    
+    def _build_output(
+        self,
+        match_data: Dict,
+        combined: Dict[str, float],
+        confidence: float,
+        model_predictions: Dict[str, Dict]
+    ) -> Dict[str, Any]:
+        """Wrap combined probabilities into the prediction dictionary"""
         result = PredictionResult(
             home_win_prob=combined["home_win_prob"],
             draw_prob=combined["draw_prob"],
@@ -167,13 +287,12 @@ class EnsembleModel(BasePredictor):
     
     def _simple_average(self, predictions: List[Dict]) -> Dict[str, float]:
         """Simple average of all predictions"""
-        n = len(predictions)
-        
-        home_win = sum(p["home_win_prob"] for p in predictions) / n
-        draw = sum(p["draw_prob"] for p in predictions) / n
-        away_win = sum(p["away_win_prob"] for p in predictions) / n
+        home_win = sum(p["home_win_prob"] for p in predictions)
+        draw = sum(p["draw_prob"] for p in predictions)
+        away_win = sum(p["away_win_prob"] for p in predictions)
         
-        probs = normalize_probabilities([home_win, draw, away_win])
+        # Normalize (also takes care of dividing by the model count)
+        probs = normalize_three_way(home_win, draw, away_win)
         
         # Average expected goals if available
         exp_home = None
@@ -197,7 +316,11 @@ class EnsembleModel(BasePredictor):
         home_win = 0.0
         draw = 0.0
         away_win = 0.0
-        total_weight = 0.0
+        
+        # Weighted average expected goals
+        exp_home = None
+        exp_away = None
+        total_goals_weight = 0.0
         
         for pred in predictions:
             model_name = pred.get("model", "unknown")
@@ -206,33 +329,19 @@ class EnsembleModel(BasePredictor):
             home_win += pred["home_win_prob"] * weight
             draw += pred["draw_prob"] * weight
             away_win += pred["away_win_prob"] * weight
-            total_weight += weight
-        
-        if total_weight > 0:
-            home_win /= total_weight
-            draw /= total_weight
-            away_win /= total_weight
-        
-        probs = normalize_probabilities([home_win, draw, away_win])
-        
-        # Weighted average expected goals
-        exp_home = None
-        exp_away = None
-        total_goals_weight = 0.0
-        
-        for pred in predictions:
+            
             if pred.get("expected_home_goals"):
-                model_name = pred.get("model", "unknown")
-                weight = self.weights.get(model_name, 1 / len(predictions))
-                
                 if exp_home is None:
-                    exp_home = 0
-                    exp_away = 0
+                    exp_home = 0.0
+                    exp_away = 0.0
                 
                 exp_home += pred["expected_home_goals"] * weight
                 exp_away += pred["expected_away_goals"] * weight
                 total_goals_weight += weight
         
+        # Normalize (also takes care of dividing by the total weight)
+        probs = normalize_three_way(home_win, draw, away_win)
+        
         if total_goals_weight > 0:
             exp_home /= total_goals_weight
             exp_away /= total_goals_weight
@@ -253,29 +362,29 @@ class EnsembleModel(BasePredictor):
         if len(predictions) < 2:
             return 0.5
         
-        # Get predicted outcomes
-        outcomes = []
+        # Count predicted outcomes (0 = H, 1 = D, 2 = A) and sum the top probabilities
+        counts = [0, 0, 0]
+        max_prob_sum = 0.0
         for pred in predictions:
-            max_prob = max(
-                pred["home_win_prob"],
-                pred["draw_prob"],
-                pred["away_win_prob"]
-            )
-            if max_prob == pred["home_win_prob"]:
-                outcomes.append("H")
-            elif max_prob == pred["draw_prob"]:
-                outcomes.append("D")
+            home_win = pred["home_win_prob"]
+            draw = pred["draw_prob"]
+            away_win = pred["away_win_prob"]
+            
+            if home_win >= draw and home_win >= away_win:
+                counts[0] += 1
+                max_prob_sum += home_win
+            elif draw >= away_win:
+                counts[1] += 1
+                max_prob_sum += draw
             else:
-                outcomes.append("A")
+                counts[2] += 1
+                max_prob_sum += away_win
         
         # Calculate agreement
-        agreement = max(outcomes.count(o) for o in set(outcomes)) / len(outcomes)
+        agreement = max(counts) / len(predictions)
         
         # Adjust based on probability spread
-        avg_max_prob = np.mean([
-            max(p["home_win_prob"], p["draw_prob"], p["away_win_prob"])
-            for p in predictions
-        ])
+        avg_max_prob = max_prob_sum / len(predictions)
         
         return (agreement + avg_max_prob) / 2
     
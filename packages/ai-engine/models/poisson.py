@@ -2,11 +2,13 @@
 Poisson Model - Bivariate Poisson dağılımı ile maç skor tahmini
 """
 
+import math
 import numpy as np
 import pandas as pd
-from scipy import stats
+from numba import njit, vectorize
 from scipy.optimize import minimize
-from typing import Any, Dict, List, Optional, Tuple
+from scipy.special import gammaln
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 import structlog
 
 from .base import BasePredictor, PredictionResult, normalize_probabilities
@@ -14,6 +16,95 @@ from .base import BasePredictor, PredictionResult, normalize_probabilities
 logger = structlog.get_logger()
 
 
+@vectorize(["float64(float64, int64, float64)"], cache=True, fastmath=True)
+def _poisson_pmf(lam: float, goals: int, log_fact: float) -> float:
+    """
+    Poisson PMF as a fused ufunc: exp(k * log(lam) - lam - log(k!)).
+    
+    log_fact is log(goals!), looked up by the caller. lam == 0 is
+    handled explicitly instead of going through log(0).
+    """
+    if goals == 0:
+        return math.exp(-lam)
+    if lam <= 0.0:
+        return 0.0
+    return math.exp(goals * math.log(lam) - lam - log_fact)
+
+
+@njit(cache=True, fastmath=True)
+def _poisson_nll(
+    params: np.ndarray,
+    home_idx: np.ndarray,
+    away_idx: np.ndarray,
+    home_goals: np.ndarray,
+    away_goals: np.ndarray,
+    n_teams: int,
+    reg: float
+) -> float:
+    """
+    Regularized negative log-likelihood of the Poisson model.
+    
+    params = [home_adv, attack1..n, defense1..n]; log(lambda) is the
+    linear predictor, so logpmf(k) = k * log_lambda - lambda - lgamma(k + 1).
+    """
+    home_adv = params[0]
+    ll = 0.0
+    for i in range(home_idx.shape[0]):
+        h = home_idx[i]
+        a = away_idx[i]
+        log_home = home_adv + params[1 + h] - params[1 + n_teams + a]
+        log_away = params[1 + a] - params[1 + n_teams + h]
+        ll += home_goals[i] * log_home - math.exp(log_home) - math.lgamma(home_goals[i] + 1.0)
+        ll += away_goals[i] * log_away - math.exp(log_away) - math.lgamma(away_goals[i] + 1.0)
+    
+    penalty = 0.0
+    for j in range(1, 2 * n_teams + 1):
+        penalty += params[j] * params[j]
+    
+    return -ll + reg * penalty
+
+
+@njit(cache=True, fastmath=True)
+def _poisson_nll_grad(
+    params: np.ndarray,
+    home_idx: np.ndarray,
+    away_idx: np.ndarray,
+    home_goals: np.ndarray,
+    away_goals: np.ndarray,
+    n_teams: int,
+    reg: float
+) -> np.ndarray:
+    """Analytic gradient of _poisson_nll with respect to params"""
+    home_adv = params[0]
+    grad = np.zeros_like(params)
+    for i in range(home_idx.shape[0]):
+        h = home_idx[i]
+        a = away_idx[i]
+        
+        # d(-ll)/d(log_lambda) = lambda - k
+        resid_home = math.exp(home_adv + params[1 + h] - params[1 + n_teams + a]) - home_goals[i]
+        resid_away = math.exp(params[1 + a] - params[1 + n_teams + h]) - away_goals[i]
+        
+        grad[0] += resid_home
+        grad[1 + h] += resid_home
+        grad[1 + n_teams + a] -= resid_home
+        grad[1 + a] += resid_away
+        grad[1 + n_teams + h] -= resid_away
+    
+    for j in range(1, 2 * n_teams + 1):
+        grad[j] += 2.0 * reg * params[j]
+    
+    return grad
+
+
+def _center_strengths(params: np.ndarray, n_teams: int) -> np.ndarray:
+    """Copy of params with attack and defense blocks shifted to zero mean"""
+    centered = params.copy()
+    centered[1:n_teams+1] -= centered[1:n_teams+1].mean()
+    centered[n_teams+1:] -= centered[n_teams+1:].mean()
+    return centered
+
+
 class PoissonModel(BasePredictor):
     """
     Poisson regression model for predicting football match outcomes.
@@ -22,18 +113,88 @@ class PoissonModel(BasePredictor):
     then calculates match outcome probabilities from Poisson distribution.
     """
     
+    # Maximum number of cached score matrices
+    SCORE_MATRIX_CACHE_SIZE = 4096
+    
     def __init__(self, version: str = "1.0"):
         super().__init__(model_name="poisson", version=version)
         
         # Model parameters
         self.home_advantage = 0.0
-        self.attack_strengths = {}  # team -> attack strength
-        self.defense_strengths = {}  # team -> defense strength
         self.league_avg_goals = 1.35  # Default average goals per team
         
+        # Team strengths as parallel arrays indexed by team id
+        self._teams: List[str] = []
+        self._team_index: Dict[str, int] = {}
+        self._attack = np.zeros(0)
+        self._defense = np.zeros(0)
+        
+        # Expected goals per (home, away) pair, filled by train()
+        self._lambda_home = None
+        self._lambda_away = None
+        self._score_matrix_cache: Dict[Tuple[str, str, int], np.ndarray] = {}
+        
         # Hyperparameters
         self.max_goals = 10  # Maximum goals to consider
         self.regularization = 0.001
+        
+        # log(k!) lookup for PMF evaluation
+        self._log_fact = gammaln(np.arange(self.max_goals + 2) + 1)
+    
+    @property
+    def attack_strengths(self) -> Dict[str, float]:
+        """Attack strengths as a team -> strength dict"""
+        return dict(zip(self._teams, self._attack.tolist()))
+    
+    @property
+    def defense_strengths(self) -> Dict[str, float]:
+        """Defense strengths as a team -> strength dict"""
+        return dict(zip(self._teams, self._defense.tolist()))
+    
+    def _strengths(self, team: str) -> Tuple[float, float]:
+        """(attack, defense) for a team, 0 for unknown teams"""
+        idx = self._team_index.get(team)
+        if idx is None:
+            return 0.0, 0.0
+        return float(self._attack[idx]), float(self._defense[idx])
+    
+    def _strength_arrays(self, teams: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectors of (attack, defense) for a column of teams, 0 for unknown teams"""
+        idx = teams.map(self._team_index).fillna(-1).to_numpy(dtype=np.intp)
+        # Index -1 picks the trailing zero strength
+        return np.append(self._attack, 0.0)[idx], np.append(self._defense, 0.0)[idx]
+    
+    def _expected_goals(self, home_team: str, away_team: str) -> Tuple[float, float]:
+        """Expected (home, away) goals, from the precomputed tables when both teams are known"""
+        home_i = self._team_index.get(home_team)
+        away_i = self._team_index.get(away_team)
+        if home_i is not None and away_i is not None:
+            return self._lambda_home[home_i, away_i], self._lambda_away[home_i, away_i]
+        
+        # Unknown teams get strength 0
+        home_attack, home_defense = self._strengths(home_team)
+        away_attack, away_defense = self._strengths(away_team)
+        return self._goal_rates(home_attack, home_defense, away_attack, away_defense)
+    
+    def _goal_rates(self, home_attack, home_defense, away_attack, away_defense):
+        """Expected (home, away) goals from strengths; scalars or arrays"""
+        exp_home = np.exp(self.home_advantage + home_attack - away_defense) * self.league_avg_goals
+        exp_away = np.exp(away_attack - home_defense) * self.league_avg_goals
+        return exp_home, exp_away
+    
+    def _poisson_pmf_vec(self, lam, max_goals: Optional[int] = None) -> np.ndarray:
+        """
+        P(goals = k) for k in 0..max_goals-1 using the log-factorial table.
+        
+        lam may be a scalar or an array; the goal axis is appended last.
+        """
+        if max_goals is None:
+            max_goals = self.max_goals
+        if max_goals > len(self._log_fact):
+            self._log_fact = gammaln(np.arange(max_goals + 2) + 1)
+        
+        lam = np.asarray(lam, dtype=np.float64)[..., None]
+        return _poisson_pmf(lam, np.arange(max_goals, dtype=np.int64), self._log_fact[:max_goals])
     
     def train(self, data: pd.DataFrame) -> Dict[str, float]:
         """
@@ -47,15 +208,26 @@ class PoissonModel(BasePredictor):
         """
         logger.info("training_started", model=self.model_name, samples=len(data))
         
-        # Filter completed matches
-        matches = data[data["home_score"].notna()].copy()
+        # Filter completed matches with both teams known (a null team would
+        # get category code -1 and alias other parameters in the kernels)
+        matches = data[
+            data["home_score"].notna()
+            & data["home_team"].notna()
+            & data["away_team"].notna()
+        ].copy()
         
         if len(matches) < 50:
             logger.warning("insufficient_data", count=len(matches))
             return {"error": "Insufficient training data"}
         
-        # Get unique teams
-        teams = list(set(matches["home_team"].unique()) | set(matches["away_team"].unique()))
+        # Shared categories give integer team codes without hashing per row
+        home_teams = matches["home_team"].astype("category")
+        away_teams = matches["away_team"].astype("category")
+        categories = home_teams.cat.categories.union(away_teams.cat.categories)
+        home_teams = home_teams.cat.set_categories(categories)
+        away_teams = away_teams.cat.set_categories(categories)
+        
+        teams = list(categories)
         n_teams = len(teams)
         team_idx = {team: i for i, team in enumerate(teams)}
         
@@ -65,44 +237,33 @@ class PoissonModel(BasePredictor):
         x0[0] = 0.25  # Initial home advantage
         
         # Prepare match data
-        home_idx = matches["home_team"].map(team_idx).values
-        away_idx = matches["away_team"].map(team_idx).values
+        home_idx = home_teams.cat.codes.to_numpy(dtype=np.int64)
+        away_idx = away_teams.cat.codes.to_numpy(dtype=np.int64)
+        assert home_idx.min() >= 0 and away_idx.min() >= 0
         home_goals = matches["home_score"].values.astype(float)
         away_goals = matches["away_score"].values.astype(float)
         
         # Calculate league average
         self.league_avg_goals = (home_goals.mean() + away_goals.mean()) / 2
         
-        # Optimize parameters
-        def neg_log_likelihood(params):
-            home_adv = params[0]
-            attack = params[1:n_teams+1]
-            defense = params[n_teams+1:]
-            
-            # Expected goals
-            lambda_home = np.exp(home_adv + attack[home_idx] - defense[away_idx])
-            lambda_away = np.exp(attack[away_idx] - defense[home_idx])
-            
-            # Log likelihood
-            ll = (stats.poisson.logpmf(home_goals, lambda_home).sum() +
-                  stats.poisson.logpmf(away_goals, lambda_away).sum())
-            
-            # Regularization
-            reg = self.regularization * (np.sum(attack**2) + np.sum(defense**2))
-            
-            return -ll + reg
+        args = (home_idx, away_idx, home_goals, away_goals, n_teams, float(self.regularization))
         
-        # Constraint: sum of attack/defense = 0
-        constraints = [
-            {"type": "eq", "fun": lambda x: np.sum(x[1:n_teams+1])},
-            {"type": "eq", "fun": lambda x: np.sum(x[n_teams+1:])}
-        ]
+        # Sum-to-zero attack/defense is enforced by centering inside the
+        # objective, so the problem is unconstrained. Centering is a linear
+        # projection, so the gradient is the centered gradient.
+        def objective(free_params):
+            return _poisson_nll(_center_strengths(free_params, n_teams), *args)
         
+        def gradient(free_params):
+            grad = _poisson_nll_grad(_center_strengths(free_params, n_teams), *args)
+            return _center_strengths(grad, n_teams)
+        
+        # Optimize parameters (compiled objective with analytic gradient)
         result = minimize(
-            neg_log_likelihood,
+            objective,
             x0,
-            method="SLSQP",
-            constraints=constraints,
+            jac=gradient,
+            method="L-BFGS-B",
             options={"maxiter": 1000}
         )
         
@@ -110,10 +271,19 @@ class PoissonModel(BasePredictor):
             logger.warning("optimization_warning", message=result.message)
         
         # Store parameters
-        self.home_advantage = result.x[0]
-        for i, team in enumerate(teams):
-            self.attack_strengths[team] = result.x[1 + i]
-            self.defense_strengths[team] = result.x[n_teams + 1 + i]
+        params = _center_strengths(result.x, n_teams)
+        self.home_advantage = params[0]
+        self._teams = teams
+        self._team_index = team_idx
+        self._attack = params[1:n_teams+1].copy()
+        self._defense = params[n_teams+1:].copy()
+        
+        # Precompute expected goals for every known pairing: [home, away]
+        # strength_gap[i, j] = attack[i] - defense[j]
+        strength_gap = np.subtract.outer(self._attack, self._defense)
+        self._lambda_home = np.exp(self.home_advantage + strength_gap) * self.league_avg_goals
+        self._lambda_away = np.exp(strength_gap.T) * self.league_avg_goals
+        self._score_matrix_cache.clear()
         
         # Calculate training metrics
         metrics = self._evaluate(matches)
@@ -133,49 +303,61 @@ class PoissonModel(BasePredictor):
     
     def _evaluate(self, data: pd.DataFrame) -> Dict[str, float]:
         """Evaluate model on data"""
-        correct = 0
-        total = 0
-        log_loss_sum = 0
-        
-        for _, row in data.iterrows():
-            pred = self.predict({
-                "home_team": row["home_team"],
-                "away_team": row["away_team"]
-            })
-            
-            if pred.get("error"):
-                continue
-            
-            # Actual result
-            if row["home_score"] > row["away_score"]:
-                actual = "H"
-                actual_probs = [1, 0, 0]
-            elif row["home_score"] == row["away_score"]:
-                actual = "D"
-                actual_probs = [0, 1, 0]
-            else:
-                actual = "A"
-                actual_probs = [0, 0, 1]
-            
-            # Predicted result
-            probs = [pred["home_win_prob"], pred["draw_prob"], pred["away_win_prob"]]
-            predicted = ["H", "D", "A"][np.argmax(probs)]
-            
-            if predicted == actual:
-                correct += 1
-            total += 1
-            
-            # Log loss
-            eps = 1e-15
-            probs = np.clip(probs, eps, 1 - eps)
-            log_loss_sum -= np.sum(np.array(actual_probs) * np.log(probs))
+        total = len(data)
+        if total == 0:
+            return {"accuracy": 0, "log_loss": 0, "samples": 0}
+        
+        # Expected goals for all matches
+        home_attack, home_defense = self._strength_arrays(data["home_team"])
+        away_attack, away_defense = self._strength_arrays(data["away_team"])
+        exp_home, exp_away = self._goal_rates(home_attack, home_defense, away_attack, away_defense)
+        
+        probs = self._outcome_probs(exp_home, exp_away)
+        
+        # Actual result (0 = H, 1 = D, 2 = A)
+        home_score = data["home_score"].to_numpy()
+        away_score = data["away_score"].to_numpy()
+        actual = np.select(
+            [home_score > away_score, home_score == away_score],
+            [0, 1],
+            default=2
+        )
+        
+        accuracy = np.mean(np.argmax(probs, axis=1) == actual)
+        
+        # Log loss
+        eps = 1e-15
+        actual_probs = np.clip(probs[np.arange(total), actual], eps, 1 - eps)
+        log_loss = -np.mean(np.log(actual_probs))
         
         return {
-            "accuracy": round(correct / total, 4) if total > 0 else 0,
-            "log_loss": round(log_loss_sum / total, 4) if total > 0 else 0,
+            "accuracy": round(float(accuracy), 4),
+            "log_loss": round(float(log_loss), 4),
             "samples": total
         }
     
+    def _outcome_probs(self, exp_home: np.ndarray, exp_away: np.ndarray) -> np.ndarray:
+        """
+        H/D/A probabilities for arrays of expected goals.
+        
+        Uses cumulative PMFs instead of building a score matrix per match:
+        P(H) = sum_i P(home=i) * P(away<i), P(D) = sum_i P(home=i) * P(away=i).
+        """
+        home_pmf = self._poisson_pmf_vec(exp_home)
+        away_pmf = self._poisson_pmf_vec(exp_away)
+        
+        # P(goals < i) for each i
+        home_below = np.cumsum(home_pmf, axis=1) - home_pmf
+        away_below = np.cumsum(away_pmf, axis=1) - away_pmf
+        
+        probs = np.column_stack([
+            np.sum(home_pmf * away_below, axis=1),
+            np.sum(home_pmf * away_pmf, axis=1),
+            np.sum(away_pmf * home_below, axis=1)
+        ])
+        probs /= probs.sum(axis=1, keepdims=True)
+        return probs
+    
     def predict(self, match_data: Dict) -> Dict[str, Any]:
         """
         Predict match outcome.
@@ -190,39 +372,74 @@ class PoissonModel(BasePredictor):
         away_team = match_data.get("away_team")
         
         # Get team strengths (use 0 for unknown teams)
-        home_attack = self.attack_strengths.get(home_team, 0)
-        home_defense = self.defense_strengths.get(home_team, 0)
-        away_attack = self.attack_strengths.get(away_team, 0)
-        away_defense = self.defense_strengths.get(away_team, 0)
-        
-        # Calculate expected goals
-        exp_home_goals = np.exp(self.home_advantage + home_attack - away_defense)
-        exp_away_goals = np.exp(away_attack - home_defense)
-        
-        # Scale by league average
-        exp_home_goals *= self.league_avg_goals
-        exp_away_goals *= self.league_avg_goals
-        
-        # Calculate score probabilities
-        home_win_prob = 0.0
-        draw_prob = 0.0
-        away_win_prob = 0.0
-        
-        for home_goals in range(self.max_goals):
-            for away_goals in range(self.max_goals):
-                prob = (stats.poisson.pmf(home_goals, exp_home_goals) *
-                       stats.poisson.pmf(away_goals, exp_away_goals))
-                
-                if home_goals > away_goals:
-                    home_win_prob += prob
-                elif home_goals == away_goals:
-                    draw_prob += prob
-                else:
-                    away_win_prob += prob
+        home_attack, home_defense = self._strengths(home_team)
+        away_attack, away_defense = self._strengths(away_team)
+        
+        # Expected goals (scaled by league average)
+        exp_home_goals, exp_away_goals = self._expected_goals(home_team, away_team)
+        
+        # Calculate score probabilities: [i,j] = P(home=i) * P(away=j)
+        matrix = np.outer(
+            self._poisson_pmf_vec(exp_home_goals),
+            self._poisson_pmf_vec(exp_away_goals)
+        )
+        
+        home_win_prob = np.tril(matrix, -1).sum()
+        draw_prob = np.trace(matrix)
+        away_win_prob = np.triu(matrix, 1).sum()
         
         # Normalize
         probs = normalize_probabilities([home_win_prob, draw_prob, away_win_prob])
         
+        return self._build_output(
+            match_data, probs, exp_home_goals, exp_away_goals,
+            (home_attack, home_defense, away_attack, away_defense)
+        )
+    
+    def predict_batch(self, matches: List[Dict]) -> List[Dict]:
+        """
+        Predict multiple matches at once.
+        
+        Strengths are gathered and H/D/A probabilities computed as arrays;
+        output dicts are the same as predict() returns.
+        
+        Args:
+            matches: List of dicts with home_team, away_team
+            
+        Returns:
+            List of prediction dictionaries
+        """
+        if not matches:
+            return []
+        
+        home_teams = pd.Series([m.get("home_team") for m in matches], dtype=object)
+        away_teams = pd.Series([m.get("away_team") for m in matches], dtype=object)
+        
+        home_attack, home_defense = self._strength_arrays(home_teams)
+        away_attack, away_defense = self._strength_arrays(away_teams)
+        exp_home, exp_away = self._goal_rates(home_attack, home_defense, away_attack, away_defense)
+        
+        probs = self._outcome_probs(exp_home, exp_away)
+        strengths = np.column_stack([home_attack, home_defense, away_attack, away_defense])
+        
+        return [
+            self._build_output(match, match_probs, match_home, match_away, match_strengths)
+            for match, match_probs, match_home, match_away, match_strengths in zip(
+                matches, probs.tolist(), exp_home.tolist(), exp_away.tolist(), strengths.tolist()
+            )
+        ]
+    
+    def _build_output(
+        self,
+        match_data: Dict,
+        probs: Sequence[float],
+        exp_home_goals: float,
+        exp_away_goals: float,
+        strengths: Sequence[float]
+    ) -> Dict[str, Any]:
+        """Wrap H/D/A probabilities, expected goals and team strengths into the prediction dictionary"""
+        home_attack, home_defense, away_attack, away_defense = strengths
+        
         result = PredictionResult(
             home_win_prob=probs[0],
             draw_prob=probs[1],
@@ -240,8 +457,8 @@ class PoissonModel(BasePredictor):
         )
         
         output = result.to_dict()
-        output["home_team"] = home_team
-        output["away_team"] = away_team
+        output["home_team"] = match_data.get("home_team")
+        output["away_team"] = match_data.get("away_team")
         output["match_id"] = match_data.get("id")
         
         return output
@@ -256,24 +473,27 @@ class PoissonModel(BasePredictor):
         Calculate probability matrix for each possible score.
         
         Returns:
-            2D array where [i,j] = P(home=i, away=j)
+            Read-only 2D array where [i,j] = P(home=i, away=j)
         """
-        # Get expected goals
-        home_attack = self.attack_strengths.get(home_team, 0)
-        away_attack = self.attack_strengths.get(away_team, 0)
-        away_defense = self.defense_strengths.get(away_team, 0)
-        home_defense = self.defense_strengths.get(home_team, 0)
+        key = (home_team, away_team, max_goals)
+        cached = self._score_matrix_cache.get(key)
+        if cached is not None:
+            return cached
         
-        exp_home = np.exp(self.home_advantage + home_attack - away_defense) * self.league_avg_goals
-        exp_away = np.exp(away_attack - home_defense) * self.league_avg_goals
+        # Get expected goals
+        exp_home, exp_away = self._expected_goals(home_team, away_team)
         
         # Build probability matrix
-        matrix = np.zeros((max_goals, max_goals))
+        matrix = np.outer(
+            self._poisson_pmf_vec(exp_home, max_goals),
+            self._poisson_pmf_vec(exp_away, max_goals)
+        )
+        matrix.setflags(write=False)
         
-        for i in range(max_goals):
-            for j in range(max_goals):
-                matrix[i, j] = (stats.poisson.pmf(i, exp_home) * 
-                               stats.poisson.pmf(j, exp_away))
+        if len(self._score_matrix_cache) >= self.SCORE_MATRIX_CACHE_SIZE:
+            # Evict the oldest entry
+            self._score_matrix_cache.pop(next(iter(self._score_matrix_cache)), None)
+        self._score_matrix_cache[key] = matrix
         
         return matrix
     
@@ -286,13 +506,18 @@ class PoissonModel(BasePredictor):
         """Get most likely exact scores"""
         matrix = self.predict_score_matrix(home_team, away_team)
         
-        # Flatten and get indices
-        flat = matrix.flatten()
-        top_indices = np.argsort(flat)[::-1][:top_n]
+        # Partition out the top_n cells, then sort only those
+        flat = matrix.ravel()
+        top_n = min(top_n, flat.size)
+        if top_n <= 0:
+            return []
         
-        results = []
-        for idx in top_indices:
-            i, j = divmod(idx, matrix.shape[1])
-            results.append((f"{i}-{j}", float(flat[idx])))
+        top_indices = np.argpartition(flat, -top_n)[-top_n:]
+        top_indices = top_indices[np.argsort(-flat[top_indices])]
         
-        return results
+        home_goals, away_goals = np.unravel_index(top_indices, matrix.shape)
+        
+        return [
+            (f"{i}-{j}", p)
+            for i, j, p in zip(home_goals.tolist(), away_goals.tolist(), flat[top_indices].tolist())
+        ]
@@ -6,7 +6,7 @@ import numpy as np
 import pandas as pd
 from typing import Any, Dict, List, Optional
 import xgboost as xgb
-from sklearn.model_selection import cross_val_score, train_test_split
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import structlog
 
@@ -15,6 +15,19 @@ from .base import BasePredictor, PredictionResult, normalize_probabilities
 logger = structlog.get_logger()
 
 
+def _detect_device() -> str:
+    """Pick the XGBoost training device: cuda when a GPU is usable, else cpu"""
+    if not xgb.build_info().get("USE_CUDA"):
+        return "cpu"
+    
+    # cupy is not a dependency; without it stay on CPU
+    try:
+        import cupy
+        return "cuda" if cupy.cuda.is_available() else "cpu"
+    except Exception:
+        return "cpu"
+
+
 class XGBoostModel(BasePredictor):
     """
     XGBoost classifier for match outcome prediction.
@@ -23,6 +36,25 @@ class XGBoostModel(BasePredictor):
     match outcomes (Home Win, Draw, Away Win).
     """
     
+    # Base features and their values when missing from the data
+    FEATURE_DEFAULTS = {
+        "home_form_points": 0.0,
+        "away_form_points": 0.0,
+        "home_goals_scored_avg": 1.5,
+        "home_goals_conceded_avg": 1.0,
+        "away_goals_scored_avg": 1.2,
+        "away_goals_conceded_avg": 1.2,
+        "home_elo": 1500.0,
+        "away_elo": 1500.0
+    }
+    
+    # Feature groups used only when the first column is present (missing -> 0)
+    OPTIONAL_FEATURE_GROUPS = (
+        ("home_xg_avg", "away_xg_avg"),
+        ("h2h_home_wins", "h2h_away_wins", "h2h_draws"),
+        ("home_position", "away_position")
+    )
+    
     def __init__(self, version: str = "1.0", **xgb_params):
         super().__init__(model_name="xgboost", version=version)
         
@@ -41,13 +73,16 @@ class XGBoostModel(BasePredictor):
             "reg_lambda": 1.0,
             "random_state": 42,
             "n_jobs": -1,
-            "eval_metric": "mlogloss"
+            "eval_metric": "mlogloss",
+            "tree_method": "hist",
+            "device": _detect_device()
         }
         self.params.update(xgb_params)
         
         self.model = None
         self.feature_names = []
         self.label_encoder = LabelEncoder()
+        self._class_idx: Dict[str, int] = {}  # label -> predict_proba column
         self.scaler = None
     
     def train(self, data: pd.DataFrame, features: Optional[pd.DataFrame] = None) -> Dict[str, float]:
@@ -68,15 +103,22 @@ class XGBoostModel(BasePredictor):
         
         # Generate or use provided features
         if features is not None:
-            X = features
+            X = features.astype(np.float32)
         else:
             X = self._generate_features(matches)
         
         self.feature_names = list(X.columns)
         
         # Create target variable
-        y = matches.apply(self._get_result, axis=1)
+        home_score = matches["home_score"].to_numpy()
+        away_score = matches["away_score"].to_numpy()
+        y = np.select(
+            [home_score > away_score, home_score == away_score],
+            ["H", "D"],
+            default="A"
+        )
         y_encoded = self.label_encoder.fit_transform(y)
+        self._class_idx = {c: i for i, c in enumerate(self.label_encoder.classes_)}
         
         # Train-test split
         X_train, X_val, y_train, y_val = train_test_split(
@@ -93,6 +135,9 @@ class XGBoostModel(BasePredictor):
             verbose=False
         )
         
+        # Serve from CPU; small batches are not worth the host-to-device copy
+        self.model.get_booster().set_param({"device": "cpu"})
+        
         # Evaluate
         y_pred_train = self.model.predict(X_train)
         y_pred_val = self.model.predict(X_val)
@@ -100,14 +145,23 @@ class XGBoostModel(BasePredictor):
         train_acc = np.mean(y_pred_train == y_train)
         val_acc = np.mean(y_pred_val == y_val)
         
-        # Cross-validation
-        cv_scores = cross_val_score(self.model, X, y_encoded, cv=5, scoring="accuracy")
+        # Cross-validation on a single DMatrix (built once, sliced per fold)
+        cv_results = xgb.cv(
+            params=self.model.get_xgb_params(),
+            dtrain=xgb.DMatrix(X, label=y_encoded),
+            num_boost_round=self.params["n_estimators"],
+            nfold=5,
+            stratified=True,
+            metrics="merror",
+            seed=self.params.get("random_state", 42)
+        )
+        cv_final = cv_results.iloc[-1]
         
         metrics = {
             "train_accuracy": round(train_acc, 4),
             "val_accuracy": round(val_acc, 4),
-            "cv_accuracy": round(cv_scores.mean(), 4),
-            "cv_std": round(cv_scores.std(), 4),
+            "cv_accuracy": round(1 - cv_final["test-merror-mean"], 4),
+            "cv_std": round(cv_final["test-merror-std"], 4),
             "samples": len(X)
         }
         
@@ -118,70 +172,33 @@ class XGBoostModel(BasePredictor):
         
         return metrics
     
-    def _get_result(self, row) -> str:
-        """Get match result from scores"""
-        if row["home_score"] > row["away_score"]:
-            return "H"
-        elif row["home_score"] == row["away_score"]:
-            return "D"
-        else:
-            return "A"
-    
     def _generate_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """
         Generate features from match data.
-        Uses available columns or creates placeholders.
+        Uses available columns or falls back to FEATURE_DEFAULTS.
         """
-        features = pd.DataFrame()
+        columns = list(self.FEATURE_DEFAULTS)
+        defaults = dict(self.FEATURE_DEFAULTS)
+        
+        # Optional groups only when the data provides them
+        for group in self.OPTIONAL_FEATURE_GROUPS:
+            if group[0] in data.columns:
+                columns.extend(group)
+                defaults.update(dict.fromkeys(group, 0.0))
+        
+        features = data.reindex(columns=columns).astype(float).fillna(defaults)
+        
+        # Derived features
+        features.insert(
+            columns.index("away_elo") + 1,
+            "elo_diff",
+            features["home_elo"] - features["away_elo"]
+        )
+        if "home_position" in features.columns:
+            features["position_diff"] = features["away_position"] - features["home_position"]
         
-        # Form features (if available)
-        if "home_form_points" in data.columns:
-            features["home_form_points"] = data["home_form_points"]
-            features["away_form_points"] = data["away_form_points"]
-        else:
-            features["home_form_points"] = 0
-            features["away_form_points"] = 0
-        
-        # Goals features
-        if "home_goals_scored_avg" in data.columns:
-            features["home_goals_scored_avg"] = data["home_goals_scored_avg"]
-            features["home_goals_conceded_avg"] = data["home_goals_conceded_avg"]
-            features["away_goals_scored_avg"] = data["away_goals_scored_avg"]
-            features["away_goals_conceded_avg"] = data["away_goals_conceded_avg"]
-        else:
-            features["home_goals_scored_avg"] = 1.5
-            features["home_goals_conceded_avg"] = 1.0
-            features["away_goals_scored_avg"] = 1.2
-            features["away_goals_conceded_avg"] = 1.2
-        
-        # Rating features
-        if "home_elo" in data.columns:
-            features["home_elo"] = data["home_elo"]
-            features["away_elo"] = data["away_elo"]
-            features["elo_diff"] = features["home_elo"] - features["away_elo"]
-        else:
-            features["home_elo"] = 1500
-            features["away_elo"] = 1500
-            features["elo_diff"] = 0
-        
-        # xG features
-        if "home_xg_avg" in data.columns:
-            features["home_xg_avg"] = data["home_xg_avg"]
-            features["away_xg_avg"] = data["away_xg_avg"]
-        
-        # H2H features
-        if "h2h_home_wins" in data.columns:
-            features["h2h_home_wins"] = data["h2h_home_wins"]
-            features["h2h_away_wins"] = data["h2h_away_wins"]
-            features["h2h_draws"] = data["h2h_draws"]
-        
-        # Position features
-        if "home_position" in data.columns:
-            features["home_position"] = data["home_position"]
-            features["away_position"] = data["away_position"]
-            features["position_diff"] = data["away_position"] - data["home_position"]
-        
-        return features.fillna(0)
+        # XGBoost bins features as float32 internally
+        return features.astype(np.float32)
     
     def predict(self, match_data: Dict) -> Dict[str, Any]:
         """
@@ -193,52 +210,68 @@ class XGBoostModel(BasePredictor):
         Returns:
             Prediction dictionary
         """
-        if not self.is_trained or self.model is None:
-            return self._default_prediction(match_data)
-        
-        # Prepare features
-        if "features" in match_data:
-            features = match_data["features"]
-        else:
-            features = self._extract_features(match_data)
-        
-        # Convert to array
-        X = np.array([features[f] for f in self.feature_names]).reshape(1, -1)
-        
-        # Predict probabilities
-        probs = self.model.predict_proba(X)[0]
-        
-        # Map to H, D, A
-        classes = self.label_encoder.classes_
-        prob_dict = {c: p for c, p in zip(classes, probs)}
-        
-        home_win_prob = prob_dict.get("H", 0.33)
-        draw_prob = prob_dict.get("D", 0.33)
-        away_win_prob = prob_dict.get("A", 0.34)
-        
-        result = PredictionResult(
-            home_win_prob=home_win_prob,
-            draw_prob=draw_prob,
-            away_win_prob=away_win_prob,
-            model_name=self.model_name,
-            factors=self._get_feature_importance(match_data)
-        )
-        
-        output = result.to_dict()
-        output["home_team"] = match_data.get("home_team")
-        output["away_team"] = match_data.get("away_team")
-        output["match_id"] = match_data.get("id")
-        
-        return output
+        return self.predict_batch([match_data])[0]
     
-    def _extract_features(self, match_data: Dict) -> Dict[str, float]:
-        """Extract features from match data dict"""
-        features = {}
+    def predict_batch(self, matches: List[Dict]) -> List[Dict]:
+        """
+        Predict multiple matches with a single predict_proba call.
+        
+        Args:
+            matches: List of dicts with features or raw data
+            
+        Returns:
+            List of prediction dictionaries
+        """
+        if not matches:
+            return []
         
-        for name in self.feature_names:
-            features[name] = match_data.get(name, 0)
+        if not self.is_trained or self.model is None:
+            return [self._default_prediction(match) for match in matches]
+        
+        try:
+            # Feature matrix aligned to training columns (missing -> 0)
+            rows = [match.get("features") or match for match in matches]
+            X = np.array(
+                [[row.get(f, 0) or 0 for f in self.feature_names] for row in rows],
+                dtype=np.float32
+            )
+            
+            # Predict probabilities
+            probs = self.model.predict_proba(X)
+        except Exception as e:
+            logger.warning("prediction_error", model=self.model_name, error=str(e))
+            if len(matches) == 1:
+                return [self._default_prediction(matches[0])]
+            # Isolate the failing matches instead of dropping the whole batch
+            return [self.predict_batch([match])[0] for match in matches]
+        
+        # Map class columns to H, D, A (defaults for classes absent in training)
+        defaults = {"H": 0.33, "D": 0.33, "A": 0.34}
+        outcome_probs = np.column_stack([
+            probs[:, self._class_idx[c]] if c in self._class_idx else np.full(len(matches), defaults[c])
+            for c in ("H", "D", "A")
+        ])
+        
+        # Importances do not depend on the match
+        factors = self._get_feature_importance(matches[0])
+        
+        predictions = []
+        for match, (home_win_prob, draw_prob, away_win_prob) in zip(matches, outcome_probs.tolist()):
+            result = PredictionResult(
+                home_win_prob=home_win_prob,
+                draw_prob=draw_prob,
+                away_win_prob=away_win_prob,
+                model_name=self.model_name,
+                factors=dict(factors)
+            )
+            
+            output = result.to_dict()
+            output["home_team"] = match.get("home_team")
+            output["away_team"] = match.get("away_team")
+            output["match_id"] = match.get("id")
+            predictions.append(output)
         
-        return features
+        return predictions
     
     def _get_feature_importance(self, match_data: Dict) -> Dict[str, float]:
         """Get top feature importances for this prediction"""